@@ -9,8 +9,28 @@ from flask_cors import CORS
 import re
 import os
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from collections import deque
+from functools import lru_cache
 from urllib.parse import urlparse
 
+# Optional C-accelerated multi-pattern matcher; a pure-Python fallback below
+# keeps the same single-pass behavior when it is not installed.
+try:
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
+# Optional Hyperscan backend for the message rule scan: a true multi-pattern
+# DFA with linear-time matching. The combined-regex path below remains the
+# fallback when it is not installed.
+try:
+    import hyperscan as _hyperscan
+except ImportError:
+    _hyperscan = None
+
 app = Flask(__name__)
 CORS(app)
 
@@ -18,38 +38,75 @@ CORS(app)
 # CONFIGURATION
 # ============================================
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+# Hard cap on analyzed input: bounds worst-case regex time and stops a single
+# oversized request from pinning a worker
+MAX_INPUT_LENGTH = 4096
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
 
+# Upper bound on concurrent background Gemini calls. Request threads never
+# wait on Gemini (see the explanation cache below), so this only limits how
+# many cache-warming calls can be in flight at once.
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "16"))
+
+# Shared session so Gemini calls reuse pooled TCP+TLS connections instead of
+# paying a fresh handshake per request; sized so every in-flight call can
+# hold a keep-alive connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=max(32, 2 * GEMINI_MAX_CONCURRENCY),
+    max_retries=1
+))
+
 # ============================================
 # INPUT HANDLER MODULE
 # ============================================
 
+# All patterns are compiled once at import so the per-request path never
+# touches re's internal compile cache.
+_URL_TYPE_RE = re.compile(
+    r'https?://[^\s]+|www\.[^\s]+|[a-zA-Z0-9-]+\.(com|org|net|xyz|top|click|info|co|in|io|ly|tk|ml|ga|cf|gq|bit\.ly|tinyurl)[^\s]*',
+    re.IGNORECASE
+)
+_PHONE_TYPE_RE = re.compile(r'^[\+]?[0-9\s\-\(\)]{10,}$')
+# Whitespace needing normalization: a run of two or more, or anything
+# that is whitespace but not a plain space
+_WS_ODD_RE = re.compile(r'\s\s|[^\S ]')
+_URL_EXTRACT_RE = re.compile(
+    r'https?://[^\s]+|www\.[^\s]+|bit\.ly/[^\s]+|tinyurl\.com/[^\s]+|\b[a-z0-9.-]+\.(com|org|net|in|io|co|xyz|top|click|info|ly|tk|ml|ga|cf|gq)\b',
+    re.IGNORECASE
+)
+_PHONE_EXTRACT_RE = re.compile(r'[\+]?[0-9]{10,13}')
+
 def detect_input_type(text):
     """Auto-detect if input is URL, phone number, or message"""
     text = text.strip()
-    
+
     # Check for URL patterns
-    url_pattern = r'https?://[^\s]+|www\.[^\s]+|[a-zA-Z0-9-]+\.(com|org|net|xyz|top|click|info|co|in|io|ly|tk|ml|ga|cf|gq|bit\.ly|tinyurl)[^\s]*'
-    if re.match(url_pattern, text, re.IGNORECASE):
+    if _URL_TYPE_RE.match(text):
         return "url"
-    
+
     # Check for phone number patterns (10+ digits, may include country code)
-    phone_pattern = r'^[\+]?[0-9\s\-\(\)]{10,}$'
-    if re.match(phone_pattern, text.replace(" ", "")):
+    if _PHONE_TYPE_RE.match(text.replace(" ", "")):
         return "phone"
-    
+
     # Default to message
     return "message"
 
 def detect_language(text):
     """Detect language: English, Hindi, or Hinglish"""
-    # Hindi Unicode range
-    hindi_pattern = r'[\u0900-\u097F]'
-    hindi_chars = len(re.findall(hindi_pattern, text))
-    
-    # English pattern
-    english_chars = len(re.findall(r'[a-zA-Z]', text))
-    
+    # Single pass over the text; avoids materializing one-char match lists
+    # just to count them.
+    hindi_chars = 0
+    english_chars = 0
+    for ch in text:
+        code = ord(ch)
+        if 0x0900 <= code <= 0x097F:  # Devanagari block
+            hindi_chars += 1
+        elif 0x41 <= code <= 0x5A or 0x61 <= code <= 0x7A:  # A-Z / a-z
+            english_chars += 1
+
     total = hindi_chars + english_chars
     if total == 0:
         return "english"
@@ -63,19 +120,20 @@ def detect_language(text):
 def normalize_input(text):
     """Clean and normalize input text"""
     text = text.strip()
-    text = re.sub(r'\s+', ' ', text)  # Remove extra whitespace
+    # Most inputs have no whitespace to collapse; skip the rebuild entirely
+    # then, and let str.split's C-level whitespace handling do it otherwise
+    if _WS_ODD_RE.search(text):
+        text = ' '.join(text.split())
     return text
 
 def extract_urls_from_text(text):
     """Extract URLs from message text"""
     # include bare domains like example.com as well
-    url_pattern = r'https?://[^\s]+|www\.[^\s]+|bit\.ly/[^\s]+|tinyurl\.com/[^\s]+|\b[a-z0-9.-]+\.(com|org|net|in|io|co|xyz|top|click|info|ly|tk|ml|ga|cf|gq)\b'
-    return re.findall(url_pattern, text, re.IGNORECASE)
+    return _URL_EXTRACT_RE.findall(text)
 
 def extract_phones_from_text(text):
     """Extract phone numbers from message text"""
-    phone_pattern = r'[\+]?[0-9]{10,13}'
-    return re.findall(phone_pattern, text.replace(" ", "").replace("-", ""))
+    return _PHONE_EXTRACT_RE.findall(text.replace(" ", "").replace("-", ""))
 
 # ============================================
 # RULE-BASED RISK ANALYZER (CORE LOGIC)
@@ -237,216 +295,491 @@ PHONE_RULES = {
 # Additional heuristics
 SUSPICIOUS_PATH_TOKENS = ['verify', 'confirm', 'login', 'secure', 'account', 'update', 'bank', 'payment', 'refund', 'prize', 'claim', 'click', 'authenticate', 'signin', 'token']
 
+class _PyAhoCorasick:
+    """Minimal pure-Python Aho-Corasick automaton.
+
+    Fallback for when pyahocorasick is not installed: one linear pass over
+    the text finds every listed keyword, instead of one substring scan per
+    keyword.
+    """
+
+    def __init__(self, words):
+        goto = [{}]
+        out = [set()]
+        for word in words:
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(set())
+                state = nxt
+            out[state].add(word)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def findall(self, text):
+        """Return the set of keywords occurring anywhere in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        hits = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits |= out[state]
+        return hits
+
+
+def _build_automaton(words):
+    """Build a keyword automaton, preferring the C extension if present."""
+    if _ahocorasick is not None:
+        automaton = _ahocorasick.Automaton()
+        for word in words:
+            automaton.add_word(word, word)
+        automaton.make_automaton()
+        return automaton
+    return _PyAhoCorasick(words)
+
+
+def _scan_automaton(automaton, text):
+    """Return the set of keywords the automaton finds in text."""
+    if _ahocorasick is not None:
+        return {word for _, word in automaton.iter(text)}
+    return automaton.findall(text)
+
+
+_TLD_AC = _build_automaton(URL_RULES["suspicious_tld"]["tlds"])
+_SHORTENER_AC = _build_automaton(URL_RULES["shortener"]["domains"])
+_BRAND_AC = _build_automaton(URL_RULES["brand_spoof"]["brands"])
+_PATH_TOKEN_AC = _build_automaton(SUSPICIOUS_PATH_TOKENS)
+
+# One independent search per rule keeps overlapping rules honest: a fused
+# finditer alternation drops any rule whose only occurrence lies inside an
+# earlier rule's match span (e.g. "send otp and money" loses money_request
+# once otp_kyc consumes "send otp"), and would disagree with the Hyperscan
+# path, which reports every matching pattern regardless of overlap.
+_MSG_RULE_COMPILED = tuple(
+    (name, tuple(re.compile(p, re.IGNORECASE) for p in rule_data["patterns"]))
+    for name, rule_data in MESSAGE_RULES.items()
+)
+
+# Compile the message rules into a Hyperscan block-mode database when the
+# binding is available; pattern ids map back to rule names.
+_MSG_HS_DB = None
+_MSG_HS_RULES = ()
+if _hyperscan is not None:
+    try:
+        _hs_patterns = []
+        _hs_rule_names = []
+        for _name, _rule_data in MESSAGE_RULES.items():
+            for _pattern in _rule_data["patterns"]:
+                _hs_patterns.append(_pattern.encode("utf-8"))
+                _hs_rule_names.append(_name)
+        _MSG_HS_DB = _hyperscan.Database(mode=_hyperscan.HS_MODE_BLOCK)
+        _MSG_HS_DB.compile(
+            expressions=_hs_patterns,
+            ids=list(range(len(_hs_patterns))),
+            flags=[_hyperscan.HS_FLAG_CASELESS | _hyperscan.HS_FLAG_UTF8
+                   | _hyperscan.HS_FLAG_UCP | _hyperscan.HS_FLAG_SINGLEMATCH] * len(_hs_patterns)
+        )
+        _MSG_HS_RULES = tuple(_hs_rule_names)
+    except Exception:
+        # Unsupported pattern or runtime issue: stay on the regex path
+        _MSG_HS_DB = None
+
+
+def _scan_message_rules(text_lower):
+    """Return the names of message rules that match text, each at most once."""
+    if _MSG_HS_DB is not None:
+        hits = set()
+        _MSG_HS_DB.scan(
+            text_lower.encode("utf-8"),
+            match_event_handler=lambda pid, start, end, flags, ctx: hits.add(_MSG_HS_RULES[pid])
+        )
+        return [name for name in MESSAGE_RULES if name in hits]
+    matched = []
+    for rule_name, patterns in _MSG_RULE_COMPILED:
+        for pattern in patterns:
+            if pattern.search(text_lower):
+                matched.append(rule_name)
+                break  # Count each rule only once
+    return matched
+
+
+URL_RULES["ip_based"]["compiled"] = re.compile(URL_RULES["ip_based"]["pattern"])
+URL_RULES["random_string"]["compiled"] = re.compile(URL_RULES["random_string"]["pattern"])
+
+# Flattened views of the rule tables for the hot paths: the nested dicts stay
+# the readable source of truth, but the analyzers read these constants instead
+# of doing several dict lookups per rule per call.
+_MSG_RULE_INFO = {name: (rd["weight"], rd["flag"]) for name, rd in MESSAGE_RULES.items()}
+_IP_RE, _IP_WEIGHT, _IP_FLAG = (URL_RULES["ip_based"][k] for k in ("compiled", "weight", "flag"))
+_TLDS, _TLD_WEIGHT, _TLD_FLAG = (URL_RULES["suspicious_tld"][k] for k in ("tlds", "weight", "flag"))
+_SHORTENER_WEIGHT, _SHORTENER_FLAG = (URL_RULES["shortener"][k] for k in ("weight", "flag"))
+_BRANDS, _BRAND_WEIGHT, _BRAND_FLAG = (URL_RULES["brand_spoof"][k] for k in ("brands", "weight", "flag"))
+_SUBDOMAIN_THRESHOLD, _SUBDOMAIN_WEIGHT, _SUBDOMAIN_FLAG = (
+    URL_RULES["many_subdomains"][k] for k in ("threshold", "weight", "flag"))
+_LONG_URL_THRESHOLD, _LONG_URL_WEIGHT, _LONG_URL_FLAG = (
+    URL_RULES["long_url"][k] for k in ("threshold", "weight", "flag"))
+_RANDOM_RE, _RANDOM_WEIGHT, _RANDOM_FLAG = (
+    URL_RULES["random_string"][k] for k in ("compiled", "weight", "flag"))
+_FOREIGN_CODES, _FOREIGN_WEIGHT, _FOREIGN_FLAG = (
+    PHONE_RULES["foreign_code"][k] for k in ("codes", "weight", "flag"))
+_INVALID_WEIGHT, _INVALID_FLAG = (PHONE_RULES["invalid_pattern"][k] for k in ("weight", "flag"))
+_LENGTH_WEIGHT, _LENGTH_FLAG = (PHONE_RULES["length_issue"][k] for k in ("weight", "flag"))
+
+_WEIRD_DOMAIN_RE = re.compile(r'[^a-z0-9.-]', re.IGNORECASE)
+_PHONE_STRIP_RE = re.compile(r'[\s\-()]')
+_NONDIGIT_RE = re.compile(r'\D')
+
+# Scam inputs are highly repetitive (the same forwarded SMS or shortener URL
+# arrives many times), so each analyzer core is memoized. Cached results are
+# frozen to tuples; the public wrappers rebuild the mutable dict shape so
+# callers can never corrupt a cache entry.
+
+def _freeze_details(details):
+    return tuple(tuple(d.items()) for d in details)
+
+
+def _thaw_details(frozen):
+    return [dict(items) for items in frozen]
+
+
+# Common two-part public suffixes; enough for correct subdomain counting on
+# this system's traffic without shipping the full public-suffix list.
+_MULTI_PART_SUFFIXES = frozenset([
+    'co.in', 'net.in', 'org.in', 'gov.in', 'ac.in', 'res.in', 'nic.in',
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au',
+    'co.nz', 'com.sg', 'com.my', 'com.bd', 'com.pk'
+])
+
+
+@lru_cache(maxsize=2048)
+def _split_domain(domain):
+    """Split a lowercase host into (subdomain, registered domain).
+
+    Suffix-aware so www.sbi.co.in yields ('www', 'sbi.co.in') instead of
+    counting co.in as a subdomain level. Memoized: the same hosts recur
+    constantly in scam traffic.
+    """
+    parts = domain.split('.')
+    suffix_len = 2 if len(parts) >= 3 and '.'.join(parts[-2:]) in _MULTI_PART_SUFFIXES else 1
+    registered_len = min(suffix_len + 1, len(parts))
+    subdomain = '.'.join(parts[:-registered_len])
+    registered = '.'.join(parts[-registered_len:])
+    return subdomain, registered
+
+
+_LEET_TABLE = str.maketrans('0135478', 'olesatb')
+
+
 def deleet(s: str) -> str:
     """Normalize common leet substitutions to detect lookalikes."""
-    return (s.replace('0', 'o').replace('1', 'l').replace('3', 'e')
-            .replace('5', 's').replace('4', 'a').replace('7', 't').replace('8', 'b'))
+    return s.translate(_LEET_TABLE)
 
 
-def analyze_message(text):
-    """Analyze message text using rule engine"""
+@lru_cache(maxsize=4096)
+def _analyze_message_cached(text):
+    """Rule-engine core for messages; returns a frozen result tuple."""
     risk_score = 0
-    flags = []
+    flags = set()
     details = []
     
     text_lower = text.lower()
     
-    for rule_name, rule_data in MESSAGE_RULES.items():
-        for pattern in rule_data["patterns"]:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                risk_score += rule_data["weight"]
-                if rule_data["flag"] not in flags:
-                    flags.append(rule_data["flag"])
-                    details.append({
-                        "rule": rule_name,
-                        "flag": rule_data["flag"],
-                        "points": rule_data["weight"]
-                    })
-                break  # Count each rule only once
+    for rule_name in _scan_message_rules(text_lower):
+        weight, flag = _MSG_RULE_INFO[rule_name]
+        risk_score += weight
+        if flag not in flags:
+            flags.add(flag)
+            details.append({
+                "rule": rule_name,
+                "flag": flag,
+                "points": weight
+            })
+        if risk_score >= 100:
+            break  # Score is capped; further rules cannot change the verdict
     
-    # Check for embedded URLs and analyze them
+    # Check for embedded URLs with the lightweight sub-analysis: the message
+    # already scores the presence of a link, so length/random-string/path
+    # checks are redundant here (skipped entirely once saturated)
     urls = extract_urls_from_text(text)
     for url in urls[:2]:  # Limit to 2 URLs
-        url_result = analyze_url(url)
-        risk_score += min(url_result["risk_score"] // 2, 30)  # Add partial URL risk
-        flags.extend([f for f in url_result["flags"] if f not in flags])
-    
+        if risk_score >= 100:
+            break
+        url_score, url_flags, _, _ = _analyze_url_cached(url, quick=True)
+        risk_score += min(url_score // 2, 30)  # Add partial URL risk
+        flags.update(url_flags)
+
     # Check for embedded phone numbers
     phones = extract_phones_from_text(text)
     for phone in phones[:2]:
-        phone_result = analyze_phone(phone)
-        risk_score += min(phone_result["risk_score"] // 3, 15)
-        flags.extend([f for f in phone_result["flags"] if f not in flags])
+        if risk_score >= 100:
+            break
+        phone_score, phone_flags, _, _ = _analyze_phone_cached(phone)
+        risk_score += min(phone_score // 3, 15)
+        flags.update(phone_flags)
     
+    return (min(risk_score, 100), tuple(flags), _freeze_details(details),
+            tuple(urls), tuple(phones))
+
+
+def analyze_message(text):
+    """Analyze message text using rule engine"""
+    risk_score, flags, details, urls, phones = _analyze_message_cached(text)
     return {
-        "risk_score": min(risk_score, 100),
-        "flags": flags,
-        "details": details,
-        "embedded_urls": urls,
-        "embedded_phones": phones
+        "risk_score": risk_score,
+        "flags": list(flags),
+        "details": _thaw_details(details),
+        "embedded_urls": list(urls),
+        "embedded_phones": list(phones)
     }
 
 
-def analyze_url(url):
-    """Analyze URL using rule engine"""
+@lru_cache(maxsize=4096)
+def _analyze_url_cached(url, quick=False):
+    """Rule-engine core for URLs; returns a frozen result tuple.
+
+    quick=True is the lightweight mode for URLs embedded in messages: the
+    long-URL, random-string and path-token checks are skipped since the
+    message analyzer already scores the presence of a link itself.
+    """
     risk_score = 0
-    flags = []
+    flags = set()
     details = []
     
     url_lower = url.lower()
     
+    # Minimal hand-rolled split: only the host and path+query are needed
+    # here, and urlparse is a heavy pure-Python call. urlparse stays as the
+    # fallback for anything the fast path chokes on.
     try:
-        parsed = urlparse(url if url.startswith('http') else f'http://{url}')
-        domain = parsed.netloc or parsed.path.split('/')[0]
-        pathname = (parsed.path or '') + (parsed.query and ('?' + parsed.query) or '')
-    except:
-        domain = url
+        s = url if url.startswith(('http://', 'https://')) else 'http://' + url
+        after_scheme = s.split('://', 1)[1]
+        slash = after_scheme.find('/')
+        if slash == -1:
+            domain, pathname = after_scheme, ''
+        else:
+            domain, pathname = after_scheme[:slash], after_scheme[slash:]
+    except Exception:
+        try:
+            parsed = urlparse(url if url.startswith('http') else f'http://{url}')
+            domain = parsed.netloc or parsed.path.split('/')[0]
+            pathname = (parsed.path or '') + (parsed.query and ('?' + parsed.query) or '')
+        except:
+            domain = url
+            pathname = ''
     
     # IP-based URL check
-    if re.search(URL_RULES["ip_based"]["pattern"], url_lower):
-        risk_score += URL_RULES["ip_based"]["weight"]
-        flags.append(URL_RULES["ip_based"]["flag"])
-        details.append({"rule": "ip_based", "points": URL_RULES["ip_based"]["weight"]})
+    if _IP_RE.search(url_lower):
+        risk_score += _IP_WEIGHT
+        flags.add(_IP_FLAG)
+        details.append({"rule": "ip_based", "points": _IP_WEIGHT})
 
     # Punycode / IDN homograph indicator
     if 'xn--' in domain:
         risk_score += 20
-        flags.append('punycode_domain')
+        flags.add('punycode_domain')
         details.append({"rule": "punycode", "points": 20})
 
     # userinfo '@' in URL (possible phishing)
     if '@' in url_lower:
         risk_score += 18
-        flags.append('userinfo_in_url')
+        flags.add('userinfo_in_url')
         details.append({"rule": "userinfo", "points": 18})
 
     # HTTP without TLS
     if url_lower.startswith('http://') and not url_lower.startswith('https://'):
         risk_score += 8
-        flags.append('no_https')
+        flags.add('no_https')
         details.append({"rule": "no_https", "points": 8})
     
-    # Suspicious TLD check
-    for tld in URL_RULES["suspicious_tld"]["tlds"]:
-        if domain.endswith(tld):
-            risk_score += URL_RULES["suspicious_tld"]["weight"]
-            flags.append(URL_RULES["suspicious_tld"]["flag"])
-            details.append({"rule": "suspicious_tld", "tld": tld, "points": URL_RULES["suspicious_tld"]["weight"]})
-            break
-    
-    # URL shortener check
-    for shortener in URL_RULES["shortener"]["domains"]:
-        if shortener in domain:
-            risk_score += URL_RULES["shortener"]["weight"]
-            flags.append(URL_RULES["shortener"]["flag"])
-            details.append({"rule": "shortener", "points": URL_RULES["shortener"]["weight"]})
-            break
-    
-    # Brand spoofing check
-    # Brand spoofing with leet/translation detection
-    for brand in URL_RULES["brand_spoof"]["brands"]:
-        bl = brand.lower()
-        if bl in domain.lower() or bl in deleet(domain.lower()):
-            official_domains = [f'{brand}.com', f'{brand}.in', f'{brand}.co.in', f'{brand}.org']
-            is_official = any(domain.endswith(od) or domain == od.replace('www.', '') for od in official_domains)
-            if not is_official:
-                risk_score += URL_RULES["brand_spoof"]["weight"]
-                flags.append(URL_RULES["brand_spoof"]["flag"])
-                details.append({"rule": "brand_spoof", "brand": brand, "points": URL_RULES["brand_spoof"]["weight"]})
+    # Once the score saturates at 100 the remaining checks cannot change
+    # the verdict, so skip their scans entirely.
+    if risk_score < 100:
+        # Suspicious TLD check (automaton narrows candidates, endswith confirms)
+        tld_hits = _scan_automaton(_TLD_AC, domain)
+        for tld in _TLDS:
+            if tld in tld_hits and domain.endswith(tld):
+                risk_score += _TLD_WEIGHT
+                flags.add(_TLD_FLAG)
+                details.append({"rule": "suspicious_tld", "tld": tld, "points": _TLD_WEIGHT})
                 break
+
+        # URL shortener check
+        if _scan_automaton(_SHORTENER_AC, domain):
+            risk_score += _SHORTENER_WEIGHT
+            flags.add(_SHORTENER_FLAG)
+            details.append({"rule": "shortener", "points": _SHORTENER_WEIGHT})
+
+        # Brand spoofing with leet/translation detection: brands are all-letter
+        # strings, so one scan of the de-leeted lowercase domain covers both the
+        # plain and the leet-obfuscated spellings.
+        brand_hits = _scan_automaton(_BRAND_AC, deleet(domain.lower()))
+        for brand in _BRANDS:
+            if brand in brand_hits:
+                official_domains = (f'{brand}.com', f'{brand}.in', f'{brand}.co.in', f'{brand}.org')
+                is_official = _split_domain(domain.lower())[1] in official_domains
+                if not is_official:
+                    risk_score += _BRAND_WEIGHT
+                    flags.add(_BRAND_FLAG)
+                    details.append({"rule": "brand_spoof", "brand": brand, "points": _BRAND_WEIGHT})
+                    break
     
-    # Subdomain count check
-    subdomain_count = domain.count('.') - 1
-    if subdomain_count >= URL_RULES["many_subdomains"]["threshold"]:
-        risk_score += URL_RULES["many_subdomains"]["weight"]
-        flags.append(URL_RULES["many_subdomains"]["flag"])
-        details.append({"rule": "many_subdomains", "count": subdomain_count, "points": URL_RULES["many_subdomains"]["weight"]})
+        # Subdomain count check (suffix-aware so www.sbi.co.in is one level)
+        subdomain = _split_domain(domain.lower())[0]
+        subdomain_count = subdomain.count('.') + 1 if subdomain else 0
+        if subdomain_count >= _SUBDOMAIN_THRESHOLD:
+            risk_score += _SUBDOMAIN_WEIGHT
+            flags.add(_SUBDOMAIN_FLAG)
+            details.append({"rule": "many_subdomains", "count": subdomain_count, "points": _SUBDOMAIN_WEIGHT})
     
-    # Long URL check
-    if len(url) > URL_RULES["long_url"]["threshold"]:
-        risk_score += URL_RULES["long_url"]["weight"]
-        flags.append(URL_RULES["long_url"]["flag"])
-        details.append({"rule": "long_url", "length": len(url), "points": URL_RULES["long_url"]["weight"]})
+        # Long URL check
+        if not quick and len(url) > _LONG_URL_THRESHOLD:
+            risk_score += _LONG_URL_WEIGHT
+            flags.add(_LONG_URL_FLAG)
+            details.append({"rule": "long_url", "length": len(url), "points": _LONG_URL_WEIGHT})
     
-    # Random string check
-    if re.search(URL_RULES["random_string"]["pattern"], url_lower):
-        risk_score += URL_RULES["random_string"]["weight"]
-        flags.append(URL_RULES["random_string"]["flag"])
-        details.append({"rule": "random_string", "points": URL_RULES["random_string"]["weight"]})
-
-    # Suspicious path tokens
-    combined = (pathname or '') + ' ' + url_lower
-    for token in SUSPICIOUS_PATH_TOKENS:
-        if token in combined:
+        # Random string check
+        if not quick and _RANDOM_RE.search(url_lower):
+            risk_score += _RANDOM_WEIGHT
+            flags.add(_RANDOM_FLAG)
+            details.append({"rule": "random_string", "points": _RANDOM_WEIGHT})
+
+        # Suspicious path tokens
+        combined = (pathname or '') + ' ' + url_lower
+        token_hits = () if quick else _scan_automaton(_PATH_TOKEN_AC, combined)
+        if token_hits:
             risk_score += 12
-            if 'suspicious_path_token' not in flags:
-                flags.append('suspicious_path_token')
-                details.append({"rule": "suspicious_path", "points": 12})
+            flags.add('suspicious_path_token')
+            # tuple, not list: this dict is frozen into the lru_cache entry and
+            # must not hold anything a caller could mutate in place
+            details.append({"rule": "suspicious_path", "tokens": tuple(sorted(token_hits)), "points": 12})
 
     # Minimal domain character oddity check
     if not flags and domain and domain.count('.') >= 1:
-        if re.search(r'[^a-z0-9.-]', domain, re.IGNORECASE):
+        if _WEIRD_DOMAIN_RE.search(domain):
             risk_score += 6
-            flags.append('weird_domain_chars')
+            flags.add('weird_domain_chars')
             details.append({"rule": "weird_chars", "points": 6})
     
+    return (min(risk_score, 100), tuple(flags), _freeze_details(details), domain)
+
+
+def analyze_url(url):
+    """Analyze URL using rule engine"""
+    risk_score, flags, details, domain = _analyze_url_cached(url)
     return {
-        "risk_score": min(risk_score, 100),
-        "flags": flags,
-        "details": details,
+        "risk_score": risk_score,
+        "flags": list(flags),
+        "details": _thaw_details(details),
         "domain": domain
     }
 
 
-def analyze_phone(phone):
-    """Analyze phone number using rule engine"""
+def _phone_digit_stats(digits):
+    """Fused single pass over a digit string.
+
+    Returns (distinct digits among the last 10 positions, longest run of the
+    same digit anywhere) without building a set, a slice, or running a
+    backreference regex.
+    """
+    tail_start = max(len(digits) - 10, 0)
+    seen = 0  # bitmask of digits seen in the tail
+    distinct_tail = 0
+    longest_run = 0
+    run = 0
+    prev = ''
+    for i, ch in enumerate(digits):
+        if ch == prev:
+            run += 1
+        else:
+            run = 1
+            prev = ch
+        if run > longest_run:
+            longest_run = run
+        if i >= tail_start:
+            bit = 1 << (ord(ch) - 48)
+            if not seen & bit:
+                seen |= bit
+                distinct_tail += 1
+    return distinct_tail, longest_run
+
+
+@lru_cache(maxsize=4096)
+def _analyze_phone_cached(phone):
+    """Rule-engine core for phone numbers; returns a frozen result tuple."""
     risk_score = 0
-    flags = []
+    flags = set()
     details = []
     
     # Clean the phone number
-    clean_phone = re.sub(r'[\s\-\(\)]', '', phone)
+    clean_phone = _PHONE_STRIP_RE.sub('', phone)
     
     # Foreign country code check
-    for code in PHONE_RULES["foreign_code"]["codes"]:
+    for code in _FOREIGN_CODES:
         if clean_phone.startswith(code):
-            risk_score += PHONE_RULES["foreign_code"]["weight"]
-            flags.append(PHONE_RULES["foreign_code"]["flag"])
-            details.append({"rule": "foreign_code", "code": code, "points": PHONE_RULES["foreign_code"]["weight"]})
+            risk_score += _FOREIGN_WEIGHT
+            flags.add(_FOREIGN_FLAG)
+            details.append({"rule": "foreign_code", "code": code, "points": _FOREIGN_WEIGHT})
             break
     
     # Length validation (Indian numbers: 10 digits, with country code: 12-13)
-    digits_only = re.sub(r'\D', '', clean_phone)
+    digits_only = _NONDIGIT_RE.sub('', clean_phone)
     if len(digits_only) < 10 or len(digits_only) > 15:
-        risk_score += PHONE_RULES["length_issue"]["weight"]
-        flags.append(PHONE_RULES["length_issue"]["flag"])
-        details.append({"rule": "length_issue", "length": len(digits_only), "points": PHONE_RULES["length_issue"]["weight"]})
+        risk_score += _LENGTH_WEIGHT
+        flags.add(_LENGTH_FLAG)
+        details.append({"rule": "length_issue", "length": len(digits_only), "points": _LENGTH_WEIGHT})
     
     # Invalid pattern for Indian numbers
     if len(digits_only) == 10:
         # Indian mobile numbers start with 6, 7, 8, or 9
         if not digits_only[0] in '6789':
-            risk_score += PHONE_RULES["invalid_pattern"]["weight"]
-            flags.append(PHONE_RULES["invalid_pattern"]["flag"])
-            details.append({"rule": "invalid_pattern", "points": PHONE_RULES["invalid_pattern"]["weight"]})
+            risk_score += _INVALID_WEIGHT
+            flags.add(_INVALID_FLAG)
+            details.append({"rule": "invalid_pattern", "points": _INVALID_WEIGHT})
     
+    distinct_tail, longest_run = _phone_digit_stats(digits_only)
+
     # Check for repeated digits (like 9999999999)
-    if len(set(digits_only[-10:])) <= 2:
+    if distinct_tail <= 2:
         risk_score += 15
-        flags.append("suspicious_repeated_digits")
+        flags.add("suspicious_repeated_digits")
         details.append({"rule": "repeated_digits", "points": 15})
 
     # Long repeated sequences anywhere (e.g., 9999999)
-    if re.search(r'(\d)\1{4,}', digits_only):
+    if longest_run >= 5:
         if "suspicious_repeated_digits" not in flags:
             risk_score += 12
-            flags.append("suspicious_repeated_digits")
+            flags.add("suspicious_repeated_digits")
             details.append({"rule": "repeated_sequence", "points": 12})
     
+    return (min(risk_score, 100), tuple(flags), _freeze_details(details), clean_phone)
+
+
+def analyze_phone(phone):
+    """Analyze phone number using rule engine"""
+    risk_score, flags, details, clean_phone = _analyze_phone_cached(phone)
     return {
-        "risk_score": min(risk_score, 100),
-        "flags": flags,
-        "details": details,
+        "risk_score": risk_score,
+        "flags": list(flags),
+        "details": _thaw_details(details),
         "cleaned_number": clean_phone
     }
 
@@ -474,23 +807,23 @@ def calculate_risk_level(score):
 # AI EXPLANATION LAYER (GEMINI)
 # ============================================
 
-def get_gemini_explanation(input_type, risk_score, flags, language):
+@lru_cache(maxsize=512)
+def _cached_gemini_explanation(input_type, risk_score, flags_key, language):
     """
-    Get AI explanation from Gemini.
-    AI does NOT decide risk - it only explains the rule-based findings.
+    Get the AI explanation from Gemini, one round-trip per verdict
+    fingerprint. AI does NOT decide risk - it only explains the rule-based
+    findings. Raises on API failure so errors are never cached and the
+    caller can retry later.
     """
-    if not GEMINI_API_KEY:
-        return generate_fallback_explanation(input_type, risk_score, flags, language)
-    
     # Compressed JSON payload for minimal token usage
     analysis_data = {
         "input_type": input_type,
         "risk_score": risk_score,
         "risk_level": calculate_risk_level(risk_score),
-        "flags": flags,
+        "flags": list(flags_key),
         "language": language
     }
-    
+
     # Construct the prompt
     prompt = f"""You are a cybersecurity assistant explaining scam detection results to users.
 The detection was done by a RULE-BASED system, NOT by AI. Your job is ONLY to explain.
@@ -505,28 +838,75 @@ Provide a brief explanation (3-5 lines) that includes:
 Keep response simple and helpful. Use {language} language if not English.
 Do NOT make new assessments - only explain the rule findings."""
 
+    response = _SESSION.post(
+        f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
+        json={
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": 0.3,
+                "maxOutputTokens": 200
+            }
+        },
+        timeout=10
+    )
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Gemini API returned status {response.status_code}")
+    result = response.json()
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+
+# The Gemini prompt depends only on the rule verdict, not the raw input, so
+# explanations are cached per verdict fingerprint and fetched off the request
+# thread: the endpoint answers with the rule-based fallback immediately and
+# identical verdicts get the AI text once the background call completes.
+_EXPLANATION_EXECUTOR = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY)
+_EXPLANATION_CACHE = {}
+_EXPLANATION_PENDING = set()
+_EXPLANATION_LOCK = threading.Lock()
+
+
+def _explanation_fingerprint(input_type, risk_score, flags, language):
+    return (input_type, risk_score, tuple(sorted(flags)), language)
+
+
+def _fill_explanation_cache(key, input_type, risk_score, flags, language):
+    # Call the memoized API helper directly so the cache is only written on
+    # success: a failed call must not pin the rule-based fallback here, and
+    # clearing the pending marker lets a later request resubmit.
     try:
-        response = requests.post(
-            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-            json={
-                "contents": [{"parts": [{"text": prompt}]}],
-                "generationConfig": {
-                    "temperature": 0.3,
-                    "maxOutputTokens": 200
-                }
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"]
-        else:
-            return generate_fallback_explanation(input_type, risk_score, flags, language)
-            
+        explanation = _cached_gemini_explanation(input_type, risk_score, tuple(sorted(flags)), language)
+        with _EXPLANATION_LOCK:
+            _EXPLANATION_CACHE[key] = explanation
     except Exception as e:
         print(f"Gemini API error: {e}")
-        return generate_fallback_explanation(input_type, risk_score, flags, language)
+    finally:
+        with _EXPLANATION_LOCK:
+            _EXPLANATION_PENDING.discard(key)
+
+
+def get_explanation_async(input_type, risk_score, flags, language):
+    """Return the best explanation available without blocking on Gemini.
+
+    The rule verdict is ready in milliseconds while a Gemini round-trip can
+    take seconds, so this never waits on the API: a cached AI explanation is
+    returned when this verdict has been explained before, otherwise the
+    rule-based fallback is returned and a background task warms the cache.
+    """
+    key = _explanation_fingerprint(input_type, risk_score, flags, language)
+    submit = False
+    with _EXPLANATION_LOCK:
+        cached = _EXPLANATION_CACHE.get(key)
+        if cached is not None:
+            return cached
+        if GEMINI_API_KEY and key not in _EXPLANATION_PENDING:
+            _EXPLANATION_PENDING.add(key)
+            submit = True
+    if submit:
+        _EXPLANATION_EXECUTOR.submit(
+            _fill_explanation_cache, key, input_type, risk_score, tuple(flags), language
+        )
+    return generate_fallback_explanation(input_type, risk_score, flags, language)
 
 
 def generate_fallback_explanation(input_type, risk_score, flags, language):
@@ -596,7 +976,11 @@ def analyze():
         if not data or 'input' not in data:
             return jsonify({"error": "No input provided"}), 400
         
-        user_input = normalize_input(data.get('input', ''))
+        raw_input = data.get('input', '')
+        if len(raw_input) > MAX_INPUT_LENGTH:
+            return jsonify({"error": f"Input too long (max {MAX_INPUT_LENGTH} characters)"}), 413
+
+        user_input = normalize_input(raw_input)
         input_type = data.get('type', 'auto')
         
         if not user_input:
@@ -621,8 +1005,8 @@ def analyze():
         flags = analysis["flags"]
         risk_level = calculate_risk_level(risk_score)
         
-        # Get AI explanation (does NOT affect risk score)
-        explanation = get_gemini_explanation(input_type, risk_score, flags, language)
+        # Get AI explanation (does NOT affect risk score, never blocks on Gemini)
+        explanation = get_explanation_async(input_type, risk_score, flags, language)
         
         # Build response
         response = {
@@ -669,10 +1053,15 @@ def index():
 # ============================================
 
 if __name__ == '__main__':
+    # Development entry point only. In production run multiple workers via
+    # gunicorn (see README):
+    #   gunicorn -w $(nproc) -k gthread --threads 4 --timeout 30 app:app
+    debug_mode = os.environ.get("FLASK_DEBUG", "0") == "1"
     print("=" * 50)
     print("🛡️ AI-Assisted Scam Detection System")
     print("=" * 50)
     print(f"Gemini API: {'Configured' if GEMINI_API_KEY else 'Not configured (using fallback)'}")
+    print(f"Debug mode: {'on (set FLASK_DEBUG=0 to disable)' if debug_mode else 'off'}")
     print("Starting server on http://localhost:5000")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug_mode, host='0.0.0.0', port=5000)